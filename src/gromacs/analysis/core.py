@@ -97,10 +97,16 @@ API requirements
   pop any arguments that it requires and ignore everything else.
 
 * Parameters of the plugin are stored in :attr:`Worker.parameters` (either as
-  attributes or as key/value pairs, see the container class
-  :class:`gromacs.utilities.AttributeDict`).
+  attributes or as key/value pairs, like in the container class
+  :class:`gromacs.utilities.AttributeDict`); file names go into the dict
+  :attr:`Worker.parameters.filenames`.
 
-* Results are stored in :attr:`Worker.results` (also a :class:`gromacs.utilities.AttributeDict`).
+* Results are stored in the dict :attr:`Worker.results`.
+
+* Optionally, a worker can implement :meth:`Worker.process_chunk` (and
+  :meth:`Worker.merge_chunks`) to analyze the trajectory in chunks of
+  frames. All such plugins are run together by
+  :meth:`Simulation.run_pipeline`, which reads the trajectory only once.
 
 
 Classes
@@ -109,7 +115,7 @@ Classes
 .. autoclass:: Simulation
    :members: add_plugin, set_plugin, get_plugin, run,
              analyze, plot, run_all, analyze_all, _apply_all,
-             topdir, plugindir, check_file, has_plugin,
+             run_pipeline, flush, finalize, topdir, _write_file, plugindir, check_file, has_plugin,
              check_plugin_name, current_plugin
    :show-inheritance:
 
@@ -127,6 +133,8 @@ Classes
 
       The :class:`Simulation` instance who owns the plugin. Can be
       ``None`` until a successful call to :meth:`~Plugin.register`.
+      Only a weak reference is kept: the attribute becomes ``None``
+      when the :class:`Simulation` is deleted.
 
    .. attribute:: Plugin.worker
 
@@ -134,7 +142,8 @@ Classes
 
 
 .. autoclass:: Worker
-   :members: topdir, plugindir, savefig, _register_hook
+   :members: topdir, plugindir, savefig, store_xvg, store_h5,
+             _register_hook, process_chunk, merge_chunks
    :show-inheritance:
 
 """
@@ -142,15 +151,86 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import os
+import re
+import io
+import functools
+import weakref
 import errno
 import subprocess
 import warnings
+import multiprocessing
+import Queue
+import atexit
+
+import numpy
 
-from gromacs.utilities import FileUtils, AttributeDict, asiterable
+from gromacs.utilities import FileUtils
 
 import logging
 logger = logging.getLogger("gromacs.analysis")
 
+# Cache for path lookups that are repeated for the same tpr/xtc files
+# whenever a Simulation is set up; see Simulation._invalidate_path_cache().
+_PATH_CACHE_SIZE = 4096
+_realpath_cache = {}
+_isfile_cache = set()
+
+# Actions of Simulation.check_file() for a missing file.
+_RESOLVE_IGNORE, _RESOLVE_INDICATE, _RESOLVE_WARN, _RESOLVE_RAISE = range(4)
+_RESOLVE_MAP = {'ignore': _RESOLVE_IGNORE,
+                'indicate': _RESOLVE_INDICATE,
+                'warn': _RESOLVE_WARN,
+                'warning': _RESOLVE_WARN,
+                'exception': _RESOLVE_RAISE,
+                'raise': _RESOLVE_RAISE,
+                }
+
+def _canonical(*args, **kwargs):
+    """Join *args* and get the :func:`os.path.realpath`.
+
+    Returns ``None`` if any of the *args* is ``None``. With the keyword
+    *make_absolute* = ``False`` the joined path is returned unchanged.
+    """
+    for a in args:
+        if a is None:
+            return None
+    joined = os.path.join(*args)
+    if not kwargs.get('make_absolute', True):
+        return joined
+    return _realpath(joined)
+
+def _realpath(path):
+    """Cached :func:`os.path.realpath`.
+
+    The cache is keyed on the absolute path so that relative paths are
+    resolved against the current working directory.
+    """
+    path = os.path.abspath(path)
+    try:
+        return _realpath_cache[path]
+    except KeyError:
+        if len(_realpath_cache) >= _PATH_CACHE_SIZE:
+            _realpath_cache.clear()
+        p = _realpath_cache[path] = os.path.realpath(path)
+        return p
+
+def _isfile(path):
+    """Cached :func:`os.path.isfile`.
+
+    Only existing files are remembered so that files which are created
+    later are still found. As for :func:`_realpath` the cache is keyed
+    on the absolute path.
+    """
+    path = os.path.abspath(path)
+    if path in _isfile_cache:
+        return True
+    if not os.path.isfile(path):
+        return False
+    if len(_isfile_cache) >= _PATH_CACHE_SIZE:
+        _isfile_cache.clear()
+    _isfile_cache.add(path)
+    return True
+
 class Simulation(object):
     """Class that represents one simulation.
 
@@ -165,6 +245,17 @@ class Simulation(object):
     """
     # NOTE: not suitable for multiple inheritance
 
+    #: Open HDF5 file for :meth:`Worker.store_h5` (see :meth:`_get_h5file`).
+    _h5file = None
+
+    #: How output files are written, see :meth:`_write_file`.
+    io_backend = "posix"
+    _uring = None
+
+    #: Seconds that :meth:`run_pipeline` waits for results before it checks
+    #: whether its subprocesses are still alive.
+    pipeline_poll = 5.0
+
     def __init__(self, **kwargs):
         """Set up a Simulation object.
 
@@ -196,6 +287,15 @@ class Simulation(object):
              plugin instances or tuples (*plugin class*, *kwarg dict*) or tuples
              (*plugin_class_name*, *kwarg dict*) to be used; more can be
              added later with :meth:`Simulation.add_plugin`.
+           *io_backend*
+             "posix": write output files directly; "uring": batch the writes
+             of :meth:`Worker.store_xvg` and :meth:`Worker.savefig` with
+             io_uring (Linux >= 5.10 and the :mod:`liburing` bindings,
+             otherwise falls back to "posix"). Files written via io_uring
+             appear on disk when a batch is submitted, when
+             :meth:`Simulation.run` or :meth:`Simulation.plot` return
+             (or when :meth:`Simulation.flush` is called), and at the
+             latest at interpreter exit. ["posix"]
 
         """
         logger.info("Loading simulation data")
@@ -208,7 +308,7 @@ class Simulation(object):
             if val is not None:
                 return val
             try:
-                return sim.__getattribute__(attr)
+                return getattr(sim, attr)
             except AttributeError:
                 if required:
                     errmsg = "Required attribute {0!r} not found in kwargs or sim".format(attr)
@@ -221,13 +321,7 @@ class Simulation(object):
                 return None
 
         make_absolute = kwargs.pop('absolute', True)
-        def canonical(*args):
-            """Join *args* and get the :func:`os.path.realpath`."""
-            if None in args:
-                return None
-            if not make_absolute:
-                return os.path.join(*args)
-            return os.path.realpath(os.path.join(*args))
+        canonical = functools.partial(_canonical, make_absolute=make_absolute)
 
         # required files
         self.tpr = canonical(getpop('tpr', required=True))
@@ -240,13 +334,18 @@ class Simulation(object):
         resolve = "exception"
         if not strict:
             resolve = "warn"
-        for v in ('tpr', 'xtc'):
-            self.check_file(v, self.__getattribute__(v), resolve=resolve)
+        # (cached: re-creating a Simulation for the same files needs no stat())
+        self.check_file('tpr', self.tpr, resolve=resolve)
+        self.check_file('xtc', self.xtc, resolve=resolve)
 
         self.analysis_dir = kwargs.pop('analysisdir', os.path.dirname(self.tpr))
+        #: Directories that :meth:`topdir` already created (or found).
+        self._known_dirs = set()
+        #: "posix" or "uring", see :meth:`_write_file`
+        self.io_backend = kwargs.pop('io_backend', "posix")
 
         #: Registry for plugins: This dict is central.
-        self.plugins = AttributeDict()
+        self.plugins = {}
         #: Use this plugin if none is explicitly specified. Typically set with
         #: :meth:`~Simulation.set_plugin`.
         self.default_plugin_name = None
@@ -261,16 +360,21 @@ class Simulation(object):
         # list of tuples (plugin, kwargs) or just (plugin,) if no kwords
         # required (eg if plugin is an instance)
         for x in plugins:
-            try:
-                P, kwargs = asiterable(x)   # make sure to wrap strings, especially 2-letter ones!
-            except ValueError:
-                P = x
-                kwargs = {}
-            self.add_plugin(P, **kwargs)
+            if isinstance(x, tuple):
+                if len(x) == 2:
+                    P, pkwargs = x
+                elif len(x) == 1:
+                    P, pkwargs = x[0], {}
+                else:
+                    raise ValueError("plugins must be given as plugin instances or as "
+                                     "tuples (plugin, kwargs), not {0!r}".format(x))
+            else:
+                P, pkwargs = x, {}
+            self.add_plugin(P, **pkwargs)
 
         # convenience: if only a single plugin was registered we default to that one
         if len(self.plugins) == 1:
-            self.set_plugin(self.plugins.keys()[0])
+            self.set_plugin(next(iter(self.plugins)))
 
         # Is this needed? If done properly, kwargs should be empty by now BUT
         # because the same list is re-used for all plugins I cannot pop them in
@@ -278,8 +382,7 @@ class Simulation(object):
         # setup so let's not pretend it does: hence comment out the super-init
         # call:
         ## super(Simulation, self).__init__(**kwargs)
-        logger.info("Simulation instance initialised:")
-        logger.info(str(self))
+        logger.info("Simulation instance initialised: %s", self)
 
     def add_plugin(self, plugin, **kwargs):
         """Add a plugin to the registry.
@@ -309,28 +412,34 @@ class Simulation(object):
         """
         # simulation=self must be provided so that plugin knows who owns it
 
-        try:
+        if isinstance(plugin, Plugin):
             plugin.register(simulation=self)
-        except (TypeError, AttributeError):
-            # NOTE: this except clause can mask bugs in the plugin code!!
-            if type(plugin) is str:
-                import plugins            # We should be able to import this safely now...
-                plugin = plugins.__plugin_classes__[plugin]
-            # plugin registers itself in self.plugins
-            plugin(simulation=self, **kwargs)  # simulation=self is REQUIRED!
+            return
+        if isinstance(plugin, str):
+            plugin = _get_plugin_class(plugin)
+        elif not (isinstance(plugin, type) and issubclass(plugin, Plugin)):
+            raise TypeError("plugin must be a Plugin instance, a Plugin class or "
+                            "a plugin name, not {0!r}".format(plugin))
+        # plugin registers itself in self.plugins
+        plugin(simulation=self, **kwargs)  # simulation=self is REQUIRED!
 
 
     def topdir(self,*args):
         """Returns a path under self.analysis_dir, which is guaranteed to exist.
 
-        .. Note:: Parent dirs are created if necessary."""
+        .. Note:: Parent dirs are created if necessary. Directories
+                  are only created once per instance; a directory that
+                  is removed afterwards is *not* recreated.
+        """
         p = os.path.join(self.analysis_dir, *args)
         parent = os.path.dirname(p)
-        try:
-            os.makedirs(parent)
-        except OSError,err:
-            if err.errno != errno.EEXIST:
-                raise
+        if parent not in self._known_dirs:
+            try:
+                os.makedirs(parent)
+            except OSError,err:
+                if err.errno != errno.EEXIST:
+                    raise
+            self._known_dirs.add(parent)
         return p
 
     def plugindir(self, plugin_name, *args):
@@ -359,32 +468,43 @@ class Simulation(object):
               "exception"
                    raise :exc:`IOError` if it does not exist [default]
 
+        .. Note:: Existing files are remembered for the lifetime of the
+                  process, so a file that is deleted after it was found
+                  is still reported as present until
+                  :meth:`_invalidate_path_cache` is called. Missing files
+                  are always checked again.
         """
-        msg = "Missing required file {filetype!r}, got {path!r}.".format(**vars())
-        def _warn(x):
+        if path is not None and _isfile(path):
+            return True
+
+        # what happens if the file does NOT exist:
+        code = _RESOLVE_MAP[resolve]
+        if code == _RESOLVE_IGNORE:
+            return True
+        elif code == _RESOLVE_INDICATE:
+            return False
+        msg = "Missing required file %r, got %r." % (filetype, path)
+        if code == _RESOLVE_WARN:
             logger.warn(msg)
             warnings.warn(msg)
             return False
-        def _raise(x):
-            logger.error(msg)
-            raise IOError(errno.ENOENT, msg, x)
-        # what happens if the file does NOT exist:
-        solutions = {'ignore': lambda x: True,
-                     'indicate': lambda x: False,
-                     'warn': _warn,
-                     'warning': _warn,
-                     'exception': _raise,
-                     'raise': _raise,
-                     }
-
-        if path is None or not os.path.isfile(path):
-            return solutions[resolve](path)
-        return True
+        logger.error(msg)
+        raise IOError(errno.ENOENT, msg, path)
+
+    @classmethod
+    def _invalidate_path_cache(cls):
+        """Forget all cached :func:`os.path.realpath` and :func:`os.path.isfile` results.
+
+        Required if files or links are removed, moved or repointed after
+        they were checked by a :class:`Simulation`.
+        """
+        _realpath_cache.clear()
+        _isfile_cache.clear()
 
     def check_plugin_name(self,plugin_name):
         """Raises a exc:`ValueError` if *plugin_name* is not registered."""
         if not (plugin_name is None or self.has_plugin(plugin_name)):
-            raise ValueError('plugin_name ({0!r}) must be None or one of\n{1!r}\n'.format(plugin_name, self.plugins.keys()))
+            raise ValueError('plugin_name ({0!r}) must be None or one of\n{1!r}\n'.format(plugin_name, list(self.plugins)))
 
     def has_plugin(self,plugin_name):
         """Returns True if *plugin_name* is registered."""
@@ -419,18 +539,30 @@ class Simulation(object):
 
     def run(self,plugin_name=None,**kwargs):
         """Generate data files as prerequisite to analysis."""
-        return self.get_plugin(plugin_name).run(**kwargs)
+        try:
+            return self.get_plugin(plugin_name).run(**kwargs)
+        finally:
+            self.flush()
 
     def run_all(self,**kwargs):
-        """Execute the run() method for all registered plugins."""
+        """Execute the run() method for all registered plugins.
+
+        Set *n_workers* > 1 to run the plugins in parallel, see
+        :meth:`_apply_all`.
+        """
         return self._apply_all(self.run, **kwargs)
 
     def analyze(self,plugin_name=None,**kwargs):
         """Run analysis for the plugin."""
+        self.flush()           # analyze() reads the output files of run()
         return self.get_plugin(plugin_name).analyze(**kwargs)
 
     def analyze_all(self,**kwargs):
-        """Execute the analyze() method for all registered plugins."""
+        """Execute the analyze() method for all registered plugins.
+
+        Set *n_workers* > 1 to run the plugins in parallel, see
+        :meth:`_apply_all`.
+        """
         return self._apply_all(self.analyze, **kwargs)
 
     def plot(self,plugin_name=None,figure=False,**kwargs):
@@ -451,30 +583,580 @@ class Simulation(object):
               ultimately by :func:`pylab.plot`)
         """
         kwargs['figure'] = figure
-        return self.get_plugin(plugin_name).plot(**kwargs)
+        try:
+            return self.get_plugin(plugin_name).plot(**kwargs)
+        finally:
+            self.flush()
 
     def _apply_all(self, func, **kwargs):
-        """Execute *func* for all plugins."""
+        """Execute *func* for all plugins.
+
+        :Keywords:
+           *n_workers*
+              number of processes that execute the plugins; ``1`` runs
+              all plugins serially in this process, ``None`` uses all
+              available CPUs [1]
+           *scheduler*
+              execute the plugins as a :mod:`dask` task graph with this
+              scheduler: "synchronous", "threads", "processes" or a
+              :class:`dask.distributed.Client`; *n_workers* is ignored
+              in this case [``None``]
+           *kwargs*
+              all other keyword arguments are passed to *func*
+
+        .. Note:: With *n_workers* > 1 each plugin runs in a separate
+                  process on a copy of the :class:`Simulation`
+                  instance. Only the return values are passed back;
+                  changes to the workers (such as
+                  :attr:`Worker.results` set by :meth:`Worker.analyze`)
+                  are lost, so this is mostly useful for
+                  :meth:`run_all`. The same applies to a process-based
+                  or distributed *scheduler*.
+        """
+        n_workers = kwargs.pop('n_workers', 1)
+        scheduler = kwargs.pop('scheduler', None)
+        if scheduler is not None:
+            return self._apply_all_dask(func.__name__, scheduler, kwargs)
+
         results = {}
-        for plugin_name in self.plugins:
-            results[plugin_name] = func(plugin_name=plugin_name, **kwargs)
+        if n_workers == 1:
+            for plugin_name in self.plugins:
+                results[plugin_name] = func(plugin_name=plugin_name, **kwargs)
+            return results
+
+        pool = multiprocessing.Pool(processes=n_workers)
+        try:
+            jobs = {}
+            for plugin_name in self.plugins:
+                jobs[plugin_name] = pool.apply_async(_worker_call,
+                                                     (self, plugin_name, func.__name__, kwargs))
+            for plugin_name, job in jobs.items():
+                results[plugin_name] = job.get()
+        finally:
+            pool.close()
+            pool.join()
         return results
 
+    def run_pipeline(self, n_workers=None, queue_size=8, chunksize=100):
+        """Analyze the trajectory once for all plugins that process chunks.
+
+        A reader process iterates through the trajectory with
+        :mod:`MDAnalysis` and puts chunks of frames into a queue. The
+        *n_workers* worker processes take chunks from the queue and hand
+        them to :meth:`Worker.process_chunk` of each plugin that
+        implements it. The partial results are collected in this process
+        and finally passed (in frame order) to :meth:`Worker.merge_chunks`.
+
+        Plugins without :meth:`~Worker.process_chunk` are skipped; use
+        :meth:`run_all` for them. While waiting for results the
+        subprocesses are checked every :attr:`pipeline_poll` seconds; if
+        one of them died a :exc:`RuntimeError` is raised.
+
+        :Keywords:
+           *n_workers*
+              number of worker processes; ``None`` uses all CPUs [``None``]
+           *queue_size*
+              maximum number of chunks waiting to be processed [8]
+           *chunksize*
+              number of frames per chunk [100]
+
+        :Returns: list with the names of the plugins that were run
+        """
+        names = [name for name, worker in self.plugins.items()
+                 if _overrides(worker, 'process_chunk')]
+        if not names:
+            return names
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+
+        frames = multiprocessing.Queue(queue_size)
+        partials = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_read_chunks,
+                                             args=(self.tpr, self.xtc, chunksize,
+                                                   n_workers, frames, partials))]
+        processes.extend(multiprocessing.Process(target=_process_chunks,
+                                                 args=(self, names, frames, partials))
+                         for i in range(n_workers))
+        for p in processes:
+            p.start()
+
+        chunks = dict((name, []) for name in names)
+        finished = 0
+        try:
+            while finished < n_workers:
+                try:
+                    item = partials.get(timeout=self.pipeline_poll)
+                except Queue.Empty:
+                    # a process that was killed never reports back
+                    for p in processes:
+                        if not p.is_alive() and p.exitcode != 0:
+                            raise RuntimeError("run_pipeline: subprocess {0} died "
+                                               "(exit code {1})".format(p.name, p.exitcode))
+                    continue
+                if item is None:
+                    finished += 1
+                    continue
+                name, start, partial = item
+                if name is None:
+                    raise RuntimeError("run_pipeline failed in a subprocess:\n" + partial)
+                chunks[name].append((start, partial))
+        except:
+            for p in processes:
+                p.terminate()
+            raise
+        finally:
+            for p in processes:
+                p.join()
+
+        for name in names:
+            ordered = sorted(chunks[name], key=lambda c: c[0])
+            self.plugins[name].merge_chunks([partial for start, partial in ordered])
+        return names
+
+    def _apply_all_dask(self, method, scheduler, kwargs):
+        """Execute *method* for all plugins as :func:`dask.delayed` tasks.
+
+        If *scheduler* is a :class:`dask.distributed.Client` then the
+        :class:`Simulation` instance is scattered to all workers once
+        instead of being serialized again for every plugin task.
+        """
+        import dask     # optional dependency, only needed here
+
+        simulation = self
+        if not isinstance(scheduler, basestring):
+            simulation = scheduler.scatter(self, broadcast=True)
+        tasks = {}
+        for plugin_name in self.plugins:
+            tasks[plugin_name] = dask.delayed(_worker_call, pure=False)(
+                simulation, plugin_name, method, kwargs)
+        return dask.compute(tasks, scheduler=scheduler)[0]
+
+    def _get_h5file(self):
+        """Return the HDF5 file for results, opening it on first use.
+
+        The file ``analysis.h5`` in the analysis directory is created with
+        the "page" file space strategy (1 MiB pages) so that it can be
+        used with a 16 MiB page buffer.
+        """
+        if self._h5file is None:
+            import h5py     # optional dependency, only needed here
+            filename = self.topdir('analysis.h5')
+            if os.path.exists(filename):
+                self._h5file = h5py.File(filename, 'a', page_buf_size=16 << 20)
+            else:
+                self._h5file = h5py.File(filename, 'w-', fs_strategy='page',
+                                         fs_page_size=1 << 20, page_buf_size=16 << 20)
+        return self._h5file
+
+    def _write_file(self, filename, data):
+        """Write the byte string *data* to *filename* using :attr:`io_backend`.
+
+        With "uring" the write is queued and submitted together with
+        other writes (see :class:`_UringWriter`).
+        """
+        if self.io_backend == "uring":
+            if self._uring is None:
+                try:
+                    if not _uring_available():
+                        raise OSError(errno.ENOSYS, "io_uring is not supported")
+                    self._uring = _UringWriter()
+                except Exception as err:
+                    # e.g. io_uring_setup() blocked by seccomp
+                    logger.warn("io_uring is not available (%s), using io_backend='posix'", err)
+                    self.io_backend = "posix"
+            if self._uring is not None:
+                self._uring.write(filename, data)
+                return
+        with open(filename, 'wb') as f:
+            f.write(data)
+
+    def flush(self):
+        """Complete pending io_uring writes.
+
+        Only needed when output files that a :class:`Worker` wrote
+        directly (and not through :meth:`run` or :meth:`plot`) are read
+        again in the same session.
+        """
+        if self._uring is not None:
+            self._uring.flush()
+
+    def finalize(self):
+        """Complete pending io_uring writes and close the HDF5 result file."""
+        if self._uring is not None:
+            self._uring.close()
+            self._uring = None
+        if self._h5file is not None:
+            self._h5file.close()
+            self._h5file = None
+
+    def __getstate__(self):
+        # open files and the io_uring cannot be pickled; the known
+        # directories may not exist where (or when) the pickle is loaded
+        state = self.__dict__.copy()
+        state.pop('_h5file', None)
+        state.pop('_uring', None)
+        state.pop('_known_dirs', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._known_dirs = set()
+
     def __str__(self):
-        return 'Simulation(tpr={tpr!r}, xtc={xtc!r}, edr={edr!r}, ndx={ndx!r}, analysisdir={analysis_dir!r})'.format(**vars(self))
+        return "Simulation(tpr=%r, xtc=%r, edr=%r, ndx=%r, analysisdir=%r)" % \
+            (self.tpr, self.xtc, self.edr, self.ndx, self.analysis_dir)
     def __repr__(self):
         return str(self)
 
 
+#: :mod:`pylab`, imported on first use by :func:`_get_pylab`
+_pylab = None
+
+def _get_pylab():
+    """Return the :mod:`pylab` module (imported only once it is needed)."""
+    global _pylab
+    if _pylab is None:
+        import pylab
+        _pylab = pylab
+    return _pylab
+
+#: Cache for :data:`gromacs.analysis.plugins.__plugin_classes__`, see
+#: :func:`_get_plugin_class`.
+_PLUGIN_CLASSES = None
+
+def _get_plugin_class(name):
+    """Return the plugin class *name* from :mod:`gromacs.analysis.plugins`.
+
+    The plugins package is only imported on first use because it
+    imports this module itself.
+    """
+    global _PLUGIN_CLASSES
+    if _PLUGIN_CLASSES is None:
+        from gromacs.analysis import plugins
+        _PLUGIN_CLASSES = plugins.__plugin_classes__
+    return _PLUGIN_CLASSES[name]
+
+def _worker_call(simulation, plugin_name, method, kwargs):
+    """Call *method* of the plugin *plugin_name* (used by :meth:`Simulation._apply_all`).
+
+    Bound methods cannot be pickled so the worker processes (or dask
+    tasks) receive the :class:`Simulation` instance and the name of the
+    method instead.
+    """
+    return getattr(simulation.get_plugin(plugin_name), method)(**kwargs)
+
+
+def _overrides(worker, name):
+    """Returns ``True`` if the class of *worker* overrides :class:`Worker` method *name*."""
+    method = getattr(type(worker), name)
+    default = getattr(Worker, name)
+    return getattr(method, '__func__', method) is not getattr(default, '__func__', default)
+
+def _read_chunks(tpr, xtc, chunksize, n_workers, frames, partials):
+    """Put chunks ``(start, stop, times, coords, dimensions)`` of the trajectory into *frames*.
+
+    Reader process of :meth:`Simulation.run_pipeline`. Finishes by
+    putting one ``None`` per worker process into the queue.
+    """
+    try:
+        import MDAnalysis
+        u = MDAnalysis.Universe(tpr, xtc)
+        nframes = len(u.trajectory)
+        for start in range(0, nframes, chunksize):
+            stop = min(start + chunksize, nframes)
+            times = numpy.empty(stop - start)
+            coords = numpy.empty((stop - start, u.atoms.n_atoms, 3), dtype=numpy.float32)
+            dimensions = numpy.zeros((stop - start, 6), dtype=numpy.float32)
+            for i, ts in enumerate(u.trajectory[start:stop]):
+                times[i] = ts.time
+                coords[i] = ts.positions
+                if ts.dimensions is not None:
+                    dimensions[i] = ts.dimensions
+            frames.put((start, stop, times, coords, dimensions))
+    except Exception:
+        import traceback
+        partials.put((None, None, traceback.format_exc()))
+    finally:
+        for i in range(n_workers):
+            frames.put(None)
+
+def _process_chunks(simulation, names, frames, partials):
+    """Apply :meth:`Worker.process_chunk` of plugins *names* to all chunks in *frames*.
+
+    Worker process of :meth:`Simulation.run_pipeline`. The partial
+    results ``(plugin_name, start, partial)`` are put into *partials*;
+    ``None`` signals that the process is done.
+    """
+    try:
+        workers = [(name, simulation.plugins[name]) for name in names]
+        while True:
+            chunk = frames.get()
+            if chunk is None:
+                break
+            start = chunk[0]
+            for name, worker in workers:
+                partials.put((name, start, worker.process_chunk(*chunk)))
+    except Exception:
+        import traceback
+        partials.put((None, None, traceback.format_exc()))
+    partials.put(None)
+
+def _auto_chunk(shape, itemsize, size=1 << 18):
+    """Chunk shape for an HDF5 dataset with chunks of at most *size* bytes.
+
+    The longest dimension is halved until a chunk is small enough.
+    """
+    chunks = [max(1, n) for n in shape]
+    while numpy.prod(chunks) * itemsize > size:
+        i = numpy.argmax(chunks)
+        if chunks[i] == 1:
+            break
+        chunks[i] = (chunks[i] + 1) // 2
+    return tuple(chunks)
+
+def _write_xvg(stream, a, names=None, fmt="%.8g"):
+    """Write array *a* to the file object *stream* as xmgrace NXY data.
+
+    *a* is laid out like :attr:`gromacs.formats.XVG.array`, i.e. the
+    first row contains the x values and each further row one data
+    column.
+    """
+    stream.write("# xmgrace compatible NXY data file\n"
+                 "# Written by gromacs.analysis.core.Worker.store_xvg()\n")
+    stream.write("# :columns: {0!r}\n".format(names or []))
+    numpy.savetxt(stream, a.T, fmt=fmt, delimiter=" ")
+
+def _uring_available():
+    """Returns ``True`` if the kernel (>= 5.10) and :mod:`liburing` support io_uring."""
+    try:
+        release = tuple(int(v) for v in os.uname()[2].split('-')[0].split('.')[:2])
+    except (AttributeError, ValueError):
+        return False
+    if release < (5, 10):
+        return False
+    try:
+        import liburing
+    except ImportError:
+        return False
+    return True
+
+#: Open io_uring writers; their pending writes are completed at exit.
+_uring_writers = weakref.WeakSet()
+
+@atexit.register
+def _close_uring_writers():
+    for writer in list(_uring_writers):
+        try:
+            writer.close()
+        except Exception as err:
+            logger.error("Failed to complete io_uring writes: %s", err)
+
+class _UringWriter(object):
+    """Write whole files in batches through io_uring.
+
+    Each :meth:`write` queues one write request; every *batch* requests
+    (and on :meth:`flush`) the queue is submitted with a single system
+    call and all completions are reaped. Requires the :mod:`liburing`
+    Python bindings.
+    """
+    def __init__(self, entries=64, batch=16):
+        import liburing
+        self._lib = liburing
+        self.ring = liburing.io_uring()
+        self.cqes = liburing.io_uring_cqes()
+        liburing.io_uring_queue_init(entries, self.ring, 0)
+        self.batch = min(batch, entries)
+        self.pending = []    # (filename, fd, data): data must stay alive until completed
+        self.closed = False
+        _uring_writers.add(self)
+
+    def write(self, filename, data):
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        sqe = self._lib.io_uring_get_sqe(self.ring)
+        self._lib.io_uring_prep_write(sqe, fd, data, len(data), 0)
+        self._lib.io_uring_sqe_set_data64(sqe, len(self.pending))
+        self.pending.append((filename, fd, data))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Submit all queued writes and wait for their completion."""
+        if not self.pending:
+            return
+        lib = self._lib
+        try:
+            lib.io_uring_submit(self.ring)
+            for i in range(len(self.pending)):
+                lib.io_uring_wait_cqe(self.ring, self.cqes)
+                cqe = self.cqes[0]
+                res, index = cqe.res, cqe.user_data
+                lib.io_uring_cqe_seen(self.ring, cqe)
+                filename, fd, data = self.pending[index]
+                if res < 0:
+                    raise IOError(-res, os.strerror(-res), filename)
+                if res < len(data):
+                    # short write: write the rest synchronously
+                    os.lseek(fd, res, os.SEEK_SET)
+                    os.write(fd, data[res:])
+        finally:
+            for filename, fd, data in self.pending:
+                os.close(fd)
+            self.pending = []
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            _uring_writers.discard(self)
+            self._lib.io_uring_queue_exit(self.ring)
+
 
 # Plugin infrastructure
 # ---------------------
 
+#: Worker docs with the plugin documentation, see :meth:`Plugin._update_worker_docs`.
+_WORKER_DOCS = {}
+
+#: Plugin names must be python identifiers (see :attr:`Plugin.plugin_name`).
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+
+class _ParamStore(object):
+    """Container for the parameters of a :class:`Worker`.
+
+    :attr:`filenames` (a dict) is stored in a slot; all other parameters
+    can be set and read either as attributes or as key/value pairs, just
+    as with :class:`gromacs.utilities.AttributeDict`.
+    """
+    __slots__ = ('filenames', '_extra')
+
+    def __init__(self):
+        object.__setattr__(self, 'filenames', {})
+        object.__setattr__(self, '_extra', {})
+
+    def __getattr__(self, name):
+        # only called when the slots did not provide the attribute
+        if name in _ParamStore.__slots__:
+            raise AttributeError(name)
+        try:
+            return self._extra[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in _ParamStore.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            self._extra[name] = value
+
+    def __getitem__(self, name):
+        if name == 'filenames':
+            return self.filenames
+        return self._extra[name]
+
+    def __setitem__(self, name, value):
+        self.__setattr__(name, value)
+
+    def __contains__(self, name):
+        return name == 'filenames' or name in self._extra
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def update(self, *args, **kwargs):
+        for name, value in dict(*args, **kwargs).items():
+            self.__setattr__(name, value)
+
+    def keys(self):
+        return ['filenames'] + list(self._extra)
+
+    def items(self):
+        return [('filenames', self.filenames)] + list(self._extra.items())
+
+    def __getstate__(self):
+        return self.filenames, self._extra
+
+    def __setstate__(self, state):
+        object.__setattr__(self, 'filenames', state[0])
+        object.__setattr__(self, '_extra', state[1])
+
+    def __repr__(self):
+        return "{0!r}".format(dict(self.items()))
+
+
+class _WeakAttribute(object):
+    """Descriptor that holds the attribute *name* as a weak reference.
+
+    :class:`Simulation` owns its workers via :attr:`Simulation.plugins`.
+    The back-references :attr:`Worker.simulation`,
+    :attr:`Plugin.simulation`, and :attr:`Worker.plugin` are weak so
+    that neither the Simulation -> Worker -> Simulation nor the
+    Plugin <-> Worker pairs form reference cycles; a Simulation and its
+    plugins are freed without the cyclic garbage collector. The
+    attribute is ``None`` once the referenced object is gone.
+
+    The weak reference is stored in the instance dict as
+    ``_<name>_ref``. Classes that use the descriptor must pickle the
+    referenced objects themselves (see :func:`_getstate_weak`).
+    """
+    def __init__(self, name):
+        self.key = '_' + name + '_ref'
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        ref = obj.__dict__.get(self.key)
+        if ref is None:
+            return None
+        return ref()
+
+    def __set__(self, obj, value):
+        if value is None:
+            obj.__dict__[self.key] = None
+        else:
+            obj.__dict__[self.key] = weakref.ref(value)
+
+def _weak_keys(cls):
+    """Instance dict keys of all :class:`_WeakAttribute` descriptors of *cls*."""
+    return set(attr.key for klass in cls.__mro__ for attr in vars(klass).values()
+               if isinstance(attr, _WeakAttribute))
+
+def _getstate_weak(obj):
+    """State of *obj* with the weak references of its :class:`_WeakAttribute` resolved."""
+    state = obj.__dict__.copy()
+    for key in _weak_keys(type(obj)):
+        ref = state.get(key)
+        if ref is not None:
+            state[key] = ref()
+    return state
+
+def _setstate_weak(obj, state):
+    """Restore *state* from :func:`_getstate_weak` on *obj*."""
+    state = state.copy()
+    for key in _weak_keys(type(obj)):
+        if state.get(key) is not None:
+            state[key] = weakref.ref(state[key])
+    obj.__dict__.update(state)
+
+
 # worker classes (used by the plugins)
 
 class Worker(FileUtils):
     """Base class for a plugin worker."""
 
+    #: The :class:`Simulation` instance (a weak reference, i.e. only
+    #: available as long as the Simulation itself exists).
+    simulation = _WeakAttribute('simulation')
+
+    #: The :class:`Plugin` instance that created the worker (a weak
+    #: reference; the plugin is not needed once it is registered).
+    plugin = _WeakAttribute('plugin')
+
     def __init__(self,**kwargs):
         """Set up Worker class.
 
@@ -488,17 +1170,18 @@ class Worker(FileUtils):
              All other keyword arguments are passed to the super class.
         """
 
-        self.plugin = kwargs.pop('plugin', None)
-        """:class:`Plugin` instance that owns this Worker."""
-        assert self.plugin is not None                   # must be supplied, non-opt kw arg
-        self.plugin_name = self.plugin.plugin_name
+        plugin = kwargs.pop('plugin', None)
+        assert plugin is not None                        # must be supplied, non-opt kw arg
+        self.plugin = plugin
+        self.plugin_name = plugin.plugin_name
         """Name of the plugin that this Worker belongs to."""
+        self.plugin_class_name = plugin.__class__.__name__
+        """Class name of the plugin (for :meth:`__repr__`)."""
 
         self.simulation = kwargs.pop('simulation',None)  # eventually needed but can come after init
         self.location = self.plugin_name                 # directory name under analysisdir
-        self.results = AttributeDict()                   # store results
-        self.parameters = AttributeDict()                # container for options, filenames, etc...
-        self.parameters.filenames = AttributeDict()
+        self.results = {}                                # store results
+        self.parameters = _ParamStore()                  # container for options, filenames, etc...
         super(Worker,self).__init__(**kwargs)
 
         # note: We are NOT calling self._register_hook() here; subclasses do this
@@ -543,17 +1226,43 @@ class Worker(FileUtils):
     def plot(self,**kwargs):
         raise NotImplementedError
 
+    def process_chunk(self, start, stop, times, coords, dimensions):
+        """Analyze the frames *start* to *stop* (exclusive) of the trajectory.
+
+        Optional API, used by :meth:`Simulation.run_pipeline`. It is
+        called in a worker process with the *times* (in ps) of these
+        frames, the coordinates of all atoms, *coords* with shape
+        ``(stop-start, natoms, 3)``, and the unit cells, *dimensions* with
+        shape ``(stop-start, 6)`` (in MDAnalysis units, i.e. Angstrom and
+        degrees; zeros if there is no unit cell), and must return a
+        picklable partial result.
+        """
+        raise NotImplementedError
+
+    def merge_chunks(self, chunks):
+        """Combine the partial results of :meth:`process_chunk`.
+
+        *chunks* is the list of partial results in frame order. The
+        default simply stores the list as the result "chunks".
+        """
+        self.results['chunks'] = chunks
+
     def savefig(self, filename=None, ext='png'):
         """Save the current figure under the default name or *filename*.
 
         Uses the supplied format and extension *ext*.
         """
-        import pylab
+        pylab = _get_pylab()
         if filename is None:
             filename = self.parameters.figname
         _filename = self.filename(filename, ext=ext, use_my_ext=True)
-        pylab.savefig(_filename)
-        logger.info("Saved figure as {_filename!r}.".format(**vars()))
+        if self.simulation.io_backend == "uring":
+            buf = io.BytesIO()
+            pylab.savefig(buf, format=os.path.splitext(_filename)[1][1:])
+            self.simulation._write_file(_filename, buf.getvalue())
+        else:
+            pylab.savefig(_filename)
+        logger.info("Saved figure as %r.", _filename)
 
     def store_xvg(self, name, a, **kwargs):
         """Store array *a* as :class:`~gromacs.formats.XVG` in result *name*.
@@ -565,20 +1274,82 @@ class Worker(FileUtils):
         the xmgrace format and also as a :class:`~gromacs.formats.XVG`
         instance in the :attr:`gromacs.analysis.core.Worker.results`
         dictionary.
+
+        The file is written with :func:`numpy.savetxt` through a large
+        write buffer, which is much faster than :meth:`XVG.write` for
+        long time series.
+
+        :Keywords:
+           *fmt*
+              format for the numbers in the file ["%.8g"]
+           *buffer_size*
+              size of the write buffer in bytes [1048576]
+           *kwargs*
+              all other keyword arguments are passed to :class:`~gromacs.formats.XVG`
         """
         from gromacs.formats import XVG
         kwargs.pop('filename',None)     # ignore filename
+        fmt = kwargs.pop('fmt', "%.8g")
+        buffer_size = kwargs.pop('buffer_size', 1 << 20)
         filename = self.plugindir(name+'.xvg')
-        xvg = XVG(**kwargs)
+        a = numpy.asarray(a)
+        if self.simulation.io_backend == "uring":
+            buf = io.BytesIO()
+            _write_xvg(buf, a, names=kwargs.get('names'), fmt=fmt)
+            self.simulation._write_file(filename, buf.getvalue())
+        else:
+            with open(filename, 'wb', buffer_size) as xvg:
+                _write_xvg(xvg, a, names=kwargs.get('names'), fmt=fmt)
+        xvg = XVG(filename=filename, **kwargs)
         xvg.set(a)
-        xvg.write(filename)
         self.results[name] = xvg
         self.parameters.filenames[name] = filename
         return filename
 
+    def store_h5(self, name, a, chunks=None):
+        """Store array *a* as dataset ``/<plugin_name>/<name>`` in the HDF5 file.
+
+        All plugins of a :class:`Simulation` share one HDF5 file (see
+        :meth:`Simulation._get_h5file`), which avoids creating many small
+        files. If the dataset already exists then *a* is appended along
+        the first axis. The :class:`h5py.Dataset` is also stored in
+        :attr:`Worker.results` under *name*.
+
+        :Arguments:
+           *name*
+              name of the result
+           *a*
+              array
+           *chunks*
+              chunk shape of the dataset; by default chunks of about
+              256 KiB are chosen by :func:`_auto_chunk`
+
+        .. Note:: Requires :mod:`h5py`. Call :meth:`Simulation.finalize`
+                  to close the file.
+        """
+        a = numpy.atleast_1d(a)
+        group = self.simulation._get_h5file().require_group(self.plugin_name)
+        if name in group:
+            dset = group[name]
+            n = dset.shape[0]
+            dset.resize(n + a.shape[0], axis=0)
+            dset[n:] = a
+        else:
+            dset = group.create_dataset(name, data=a, maxshape=(None,) + a.shape[1:],
+                                        chunks=chunks or _auto_chunk(a.shape, a.dtype.itemsize),
+                                        compression='lzf')
+        self.results[name] = dset
+        return dset
+
+    def __getstate__(self):
+        return _getstate_weak(self)
+
+    def __setstate__(self, state):
+        _setstate_weak(self, state)
+
     def __repr__(self):
         """Represent the worker with the plugin name."""
-        return "<{0!s} (name {1!s}) Worker>".format(self.plugin.__class__.__name__, self.plugin_name)
+        return "<{0!s} (name {1!s}) Worker>".format(self.plugin_class_name, self.plugin_name)
 
 # plugins:
 # registers a worker class in Simulation.plugins and adds a pointer to Simulation to worker
@@ -609,6 +1380,8 @@ class Plugin(object):
     #: actual plugin :class:`gromacs.analysis.core.Worker` class (name with leading underscore)
     worker_class = None
 
+    simulation = _WeakAttribute('simulation')
+
     def __init__(self,name=None,simulation=None,**kwargs):
         """Registers the plugin with the simulation class.
 
@@ -628,6 +1401,8 @@ class Plugin(object):
         """
         if name is None:
             name = self.__class__.__name__
+        if not _IDENTIFIER.match(name):
+            raise ValueError("plugin name must be a valid python identifier, not {0!r}".format(name))
         self.plugin_name = name
         """Name of the plugin; this must be a **unique** identifier
         across all plugins of a :class:`Simulation` object. It should
@@ -635,7 +1410,7 @@ class Plugin(object):
         identifier as it is used as a dict key.
         """
 
-        logger.info("Initializing plugin {0!r}".format(self.plugin_name))
+        logger.info("Initializing plugin %r", self.plugin_name)
 
         assert issubclass(self.worker_class, Worker)   # must be a Worker
 
@@ -646,8 +1421,9 @@ class Plugin(object):
         #: The :class:`Worker` instance of the plugin.
         self.worker = self.worker_class(**kwargs)      # create Worker instance
 
-        #: The :class:`Simulation` instance who owns the plugin. Can be ``None``
-        #: until a successful call to :meth:`~Plugin.register`.
+        #: The :class:`Simulation` instance who owns the plugin (weak
+        #: reference). Can be ``None`` until a successful call to
+        #: :meth:`~Plugin.register`.
         self.simulation = simulation
 
         if simulation is not None:                     # can delay registration
@@ -672,13 +1448,26 @@ class Plugin(object):
         self._update_worker_docs()
         self.__is_registered = True
 
+    def __getstate__(self):
+        return _getstate_weak(self)
+
+    def __setstate__(self, state):
+        _setstate_weak(self, state)
+
     def _update_worker_docs(self):
         # improve help by  the worker class doc to the plugin
         # one: the user mostly sees the worker via simulation.plugins
-        header = "PLUGIN DOCUMENTATION"
-        try:
-            if self.worker.__doc__.find(header) == -1:
-                self.worker.__doc__ = self.__doc__ + "\n"+header+"\n" + self.worker.__doc__
-        except AttributeError:
-            pass
+        # The combined doc is built once per (plugin, worker) class pair
+        # and then shared by all worker instances.
+        key = (type(self), type(self.worker))
+        doc = _WORKER_DOCS.get(key)
+        if doc is None:
+            doc = self.worker.__doc__
+            if doc is None:
+                return
+            header = "PLUGIN DOCUMENTATION"
+            if header not in doc:
+                doc = self.__doc__ + "\n"+header+"\n" + doc
+            _WORKER_DOCS[key] = doc
+        self.worker.__doc__ = doc
 
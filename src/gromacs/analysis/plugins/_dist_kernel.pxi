@@ -0,0 +1,155 @@
+# $Id$
+# Copyright (c) 2009 Oliver Beckstein <orbeckst@gmail.com>
+# Released under the GNU Public License 3 (or higher, your choice)
+# See the file COPYING for details.
+
+# Cython kernel for the distances plugin, shared by _dist_kernel_serial.pyx
+# and _dist_kernel_openmp.pyx (see _distances_kernel for how to build them).
+# Without OpenMP the prange loop simply runs serially.
+
+from cython.parallel cimport prange
+from libc.math cimport sqrtf, floorf
+
+import numpy
+
+
+# tile sizes, see GROUP_TILE and FRAME_TILE in _distances_kernel
+cdef enum:
+    GROUP_TILE = 8
+    FRAME_TILE = 64
+
+
+cdef inline void _minimum_image(float* d, float[:, :, ::1] boxes, Py_ssize_t t) noexcept nogil:
+    """Minimum image of the vector *d* in the box of frame *t* (order c, b, a)."""
+    cdef int k, j
+    cdef float s
+    for k in range(2, -1, -1):
+        if boxes[t, k, k] > 0:
+            s = floorf(d[k] / boxes[t, k, k] + 0.5)
+            for j in range(k + 1):
+                d[j] -= s * boxes[t, k, j]
+
+cdef inline void _shortest_image(float* d, float[:, :, ::1] boxes, Py_ssize_t t) noexcept nogil:
+    """Shortest periodic image of *d*; neighbouring images are tried for a triclinic box."""
+    cdef int i, j, k
+    cdef float e0, e1, e2, best
+    cdef float b0, b1, b2
+    _minimum_image(d, boxes, t)
+    if boxes[t, 1, 0] == 0 and boxes[t, 2, 0] == 0 and boxes[t, 2, 1] == 0:
+        return
+    b0, b1, b2 = d[0], d[1], d[2]
+    best = b0*b0 + b1*b1 + b2*b2
+    for i in range(-1, 2):
+        for j in range(-1, 2):
+            for k in range(-1, 2):
+                e0 = d[0] + i * boxes[t, 0, 0] + j * boxes[t, 1, 0] + k * boxes[t, 2, 0]
+                e1 = d[1] + j * boxes[t, 1, 1] + k * boxes[t, 2, 1]
+                e2 = d[2] + k * boxes[t, 2, 2]
+                if e0*e0 + e1*e1 + e2*e2 < best:
+                    best = e0*e0 + e1*e1 + e2*e2
+                    b0, b1, b2 = e0, e1, e2
+    d[0], d[1], d[2] = b0, b1, b2
+
+cdef inline void _com(float[:, :, ::1] pos, float[:, :, ::1] boxes, float[::1] masses,
+                      int[::1] idx, Py_ssize_t start, Py_ssize_t stop, float inv_m,
+                      Py_ssize_t t, float* com) noexcept nogil:
+    """COM of the whole group idx[start:stop] in frame *t*.
+
+    The atoms are taken relative to the first atom of the group with the
+    minimum image convention.
+    """
+    cdef Py_ssize_t k
+    cdef int a = idx[start]
+    cdef int j
+    cdef float m
+    cdef float d[3]
+    cdef float s[3]
+    s[0] = s[1] = s[2] = 0
+    for k in range(start + 1, stop):
+        m = masses[idx[k]]
+        for j in range(3):
+            d[j] = pos[t, idx[k], j] - pos[t, a, j]
+        _minimum_image(d, boxes, t)
+        for j in range(3):
+            s[j] += m * d[j]
+    for j in range(3):
+        com[j] = pos[t, a, j] + s[j] * inv_m
+
+cdef inline void _primary(float[:, :, ::1] pos, float[:, :, ::1] boxes, float[::1] masses,
+                          int[::1] prim, float inv_mp, float[:, ::1] com,
+                          Py_ssize_t t) noexcept nogil:
+    """COM of the primary group in frame *t*."""
+    cdef float c[3]
+    _com(pos, boxes, masses, prim, 0, prim.shape[0], inv_mp, t, c)
+    com[t, 0] = c[0]
+    com[t, 1] = c[1]
+    com[t, 2] = c[2]
+
+cdef inline void _tile(float[:, :, ::1] pos, float[:, :, ::1] boxes, float[::1] masses,
+                       int[::1] sec, int[::1] off, float[::1] inv_m, float[:, ::1] com,
+                       Py_ssize_t gb, Py_ssize_t ng, Py_ssize_t f0, Py_ssize_t f1,
+                       float cutoff2, float[:, ::1] out_d, int[:, ::1] out_n) noexcept nogil:
+    """COM distances and contacts of groups gb..gb+ng-1 in frames f0..f1-1."""
+    cdef float tile_inv_m[GROUP_TILE]
+    cdef int tile_off[GROUP_TILE + 1]
+    cdef Py_ssize_t t, g
+    cdef float d2
+    cdef float d[3]
+    for g in range(ng):
+        tile_inv_m[g] = inv_m[gb + g]
+        tile_off[g] = off[gb + g]
+    tile_off[ng] = off[gb + ng]
+    for t in range(f0, f1):
+        for g in range(ng):
+            _com(pos, boxes, masses, sec, tile_off[g], tile_off[g+1], tile_inv_m[g], t, d)
+            d[0] -= com[t, 0]
+            d[1] -= com[t, 1]
+            d[2] -= com[t, 2]
+            _shortest_image(d, boxes, t)
+            d2 = d[0]*d[0] + d[1]*d[1] + d[2]*d[2]
+            out_n[t, gb + g] = d2 < cutoff2
+            out_d[t, gb + g] = sqrtf(d2)
+
+cdef void _compute(float[:, :, ::1] pos, float[:, :, ::1] boxes, float[::1] masses,
+                   int[::1] prim, int[::1] sec, int[::1] off, float inv_mp, float[::1] inv_m,
+                   float cutoff2, float[:, ::1] com,
+                   float[:, ::1] out_d, int[:, ::1] out_n) noexcept nogil:
+    cdef Py_ssize_t t, gt, gb, fb
+    cdef Py_ssize_t nframes = pos.shape[0]
+    cdef Py_ssize_t ngroups = off.shape[0] - 1
+    cdef Py_ssize_t ngtiles = (ngroups + GROUP_TILE - 1) // GROUP_TILE
+    cdef Py_ssize_t nftiles = (nframes + FRAME_TILE - 1) // FRAME_TILE
+    for t in prange(nframes, schedule='static'):
+        _primary(pos, boxes, masses, prim, inv_mp, com, t)
+    for gt in range(ngtiles):
+        gb = gt * GROUP_TILE
+        for fb in prange(nftiles, schedule='static'):
+            _tile(pos, boxes, masses, sec, off, inv_m, com, gb, min(GROUP_TILE, ngroups - gb),
+                  fb * FRAME_TILE, min((fb + 1) * FRAME_TILE, nframes),
+                  cutoff2, out_d, out_n)
+
+
+def compute(positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff, out=None):
+    """COM distances and contacts, Cython implementation (float32).
+
+    See :func:`gromacs.analysis.plugins._distances_kernel.compute_numpy`
+    for the arguments.
+    """
+    pos = numpy.ascontiguousarray(positions, dtype=numpy.float32)
+    box = numpy.ascontiguousarray(boxes, dtype=numpy.float32)
+    m = numpy.ascontiguousarray(masses, dtype=numpy.float32)
+    prim = numpy.ascontiguousarray(prim_idx, dtype=numpy.intc)
+    sec = numpy.ascontiguousarray(sec_idx, dtype=numpy.intc)
+    off = numpy.ascontiguousarray(sec_offsets, dtype=numpy.intc)
+    ngroups = len(off) - 1
+    inv_m = numpy.array([1.0 / m[sec[off[g]:off[g+1]]].sum() for g in range(ngroups)],
+                        dtype=numpy.float32)
+    com = numpy.empty((pos.shape[0], 3), dtype=numpy.float32)
+    if out is None:
+        out_d = numpy.empty((pos.shape[0], ngroups), dtype=numpy.float32)
+        out_n = numpy.empty((pos.shape[0], ngroups), dtype=numpy.intc)
+    else:
+        out_d, out_n = out
+    _compute(pos, box, m, prim, sec, off, 1.0 / m[prim].sum(), inv_m, cutoff*cutoff,
+             com, out_d, out_n)
+    return out_d, out_n
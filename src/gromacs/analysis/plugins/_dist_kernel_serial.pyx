@@ -0,0 +1,9 @@
+# cython: boundscheck=False, wraparound=False, cdivision=True
+# $Id$
+# Copyright (c) 2009 Oliver Beckstein <orbeckst@gmail.com>
+# Released under the GNU Public License 3 (or higher, your choice)
+# See the file COPYING for details.
+
+# Serial build of the Cython kernel for the distances plugin (compile
+# without OpenMP).
+include "_dist_kernel.pxi"
@@ -0,0 +1,488 @@
+# $Id$
+# Copyright (c) 2009 Oliver Beckstein <orbeckst@gmail.com>
+# Released under the GNU Public License 3 (or higher, your choice)
+# See the file COPYING for details.
+
+"""
+``analysis.plugins._distances_kernel`` --- Kernels for the distance plugin
+==========================================================================
+
+Computational kernels for :class:`gromacs.analysis.plugins.distances._Distances`:
+the distance between the center of mass (COM) of a primary group and
+the COMs of secondary groups and the corresponding contacts for every
+frame of a trajectory.
+
+All kernels share the signature of :func:`compute_numpy`. The groups are
+described by indices into the atom axis of *positions*: *prim_idx*
+for the primary group and the concatenated indices of all secondary
+groups, *sec_idx*, whose group boundaries are given by *sec_offsets*
+(group ``g`` is ``sec_idx[sec_offsets[g]:sec_offsets[g+1]]``, see
+:func:`flatten_groups`).
+
+Periodic boundaries are taken into account with the box vectors of
+each frame, *boxes* (see :func:`box_vectors`): a group is made whole by
+taking every atom as the periodic image closest to the first atom of
+the group (which assumes that a group extends less than half a box
+length) and the distance between two COMs is that of their closest
+periodic images (minimum image convention), as in :program:`g_dist`.
+
+The compiled kernels work in single precision like the trajectory
+coordinates themselves (*positions*, *boxes* and *masses* should be
+C-contiguous float32 arrays, see :func:`as_kernel_input`) and count contacts by
+comparing the squared distance with ``cutoff**2``; the square root is
+only taken for the distance output. They first compute the primary
+COM of every frame and then process the secondary groups in tiles of
+:data:`GROUP_TILE` groups x :data:`FRAME_TILE` frames so that the
+inverse masses and index offsets of a group tile are loaded once per
+tile.
+
+Backends
+--------
+
+The kernel is chosen with :func:`get_kernel` from the *backend* name
+or, if none is given, from the environment variable
+:envvar:`GROMACSWRAPPER_DIST_BACKEND`:
+
+"numpy"
+    pure NumPy (:func:`compute_numpy`)
+"numba"
+    Numba_ kernel, parallel over frames (:func:`compute_numba`)
+"serial"
+    Cython kernel (module :mod:`_dist_kernel_serial`)
+"openmp"
+    Cython kernel, parallel over frames with OpenMP (module
+    :mod:`_dist_kernel_openmp`)
+"cuda"
+    GPU kernel with CuPy_ (:func:`compute_cupy`); only worthwhile for
+    very large groups or trajectories (natoms * nframes > 1e8)
+
+The default is "numba" if :mod:`numba` is installed and "numpy"
+otherwise. A backend that is not available falls back to the default
+with a warning.
+
+Both Cython modules are built from the same source
+``_dist_kernel.pxi``; they are optional and have to be compiled in
+place, e.g. ::
+
+  cythonize -i _dist_kernel_serial.pyx
+  CFLAGS="-fopenmp -O3 -march=native -ffast-math" LDFLAGS="-fopenmp" \\
+     cythonize -i _dist_kernel_openmp.pyx
+
+.. _Numba: https://numba.pydata.org
+.. _CuPy: https://cupy.dev
+
+.. autofunction:: get_kernel
+.. autofunction:: compute_numba_small
+.. autofunction:: compute_numpy
+.. autofunction:: compute_cupy
+.. autofunction:: flatten_groups
+.. autofunction:: box_vectors
+
+"""
+__docformat__ = "restructuredtext en"
+
+import os
+import warnings
+
+import numpy
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+import logging
+logger = logging.getLogger('gromacs.analysis.plugins.distances')
+
+#: Environment variable that selects the kernel (see :func:`get_kernel`).
+BACKEND_ENVVAR = "GROMACSWRAPPER_DIST_BACKEND"
+
+#: Number of frames that :func:`compute_cupy` copies to the GPU at a time.
+CUDA_CHUNK = 100
+
+#: Up to this number of secondary groups :func:`get_kernel` returns the
+#: Numba kernel :func:`compute_numba_small`, which is compiled for the
+#: given number of groups.
+MAX_SPECIALIZED_GROUPS = 4
+
+#: Number of secondary groups per tile in the compiled kernels.
+GROUP_TILE = 8
+#: Number of frames per tile in the compiled kernels.
+FRAME_TILE = 64
+
+
+def flatten_groups(groups):
+    """Return ``(prim_idx, sec_idx, sec_offsets)`` for the index arrays *groups*.
+
+    The first array in *groups* is the primary group, all others are
+    secondary groups.
+    """
+    prim_idx = numpy.asarray(groups[0], dtype=numpy.intp)
+    sec_idx = numpy.concatenate(groups[1:]).astype(numpy.intp)
+    sec_offsets = numpy.cumsum([0] + [len(g) for g in groups[1:]]).astype(numpy.intp)
+    return prim_idx, sec_idx, sec_offsets
+
+def as_kernel_input(positions, boxes, masses):
+    """Return *positions*, *boxes* and *masses* as C-contiguous float32 arrays."""
+    return tuple(numpy.ascontiguousarray(x, dtype=numpy.float32)
+                 for x in (positions, boxes, masses))
+
+def empty_output(nframes, ngroups):
+    """Return uninitialized ``(distances, contacts)`` arrays for the kernels."""
+    distances = numpy.empty((nframes, ngroups), dtype=numpy.float32)
+    return distances, numpy.empty_like(distances, dtype=numpy.int32)
+
+def _minimum_image(xp, d, boxes):
+    """Apply the minimum image convention to the vectors *d* (in place).
+
+    *d* has shape ``(nframes, n, 3)`` and *boxes* ``(nframes, 3, 3)``.
+    As in GROMACS the box vectors are applied in the order c, b, a; a
+    box vector with a zero diagonal element is not periodic.
+    """
+    for k in (2, 1, 0):
+        length = boxes[:, k, k]
+        length = xp.where(length > 0, length, xp.inf)
+        shift = xp.floor(d[:, :, k] / length[:, numpy.newaxis] + 0.5)
+        d -= shift[:, :, numpy.newaxis] * boxes[:, numpy.newaxis, k, :]
+    return d
+
+#: All combinations of -1, 0, 1 box vectors: the shifts to the neighbouring images.
+_SHIFTS = numpy.array([(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)],
+                      dtype=numpy.float32)
+
+def _shortest_image(xp, d, boxes):
+    """Return the shortest periodic images of the vectors *d*.
+
+    For a triclinic box :func:`_minimum_image` alone does not always find
+    the shortest vector; as in GROMACS the neighbouring images are
+    searched as well.
+    """
+    d = _minimum_image(xp, d, boxes)
+    shifts = xp.einsum('sk,fkj->fsj', xp.asarray(_SHIFTS), boxes)
+    images = d[:, :, numpy.newaxis] + shifts[:, numpy.newaxis]
+    best = (images * images).sum(axis=3).argmin(axis=2)
+    return d + shifts[xp.arange(d.shape[0])[:, numpy.newaxis], best]
+
+def _all_groups(prim_idx, sec_idx, sec_offsets):
+    """Return all groups (primary first) as ``(idx, first, group)``.
+
+    *idx* are the atom indices of all groups, *first* the position of the
+    first atom of each group in *idx* and *group* the group of each atom.
+    """
+    idx = numpy.concatenate([prim_idx, sec_idx])
+    first = numpy.concatenate([[0], len(prim_idx) + numpy.asarray(sec_offsets[:-1])])
+    group = numpy.repeat(numpy.arange(len(first)), numpy.diff(numpy.append(first, len(idx))))
+    return idx, first, group
+
+def box_vectors(dimensions):
+    """Return the box vectors in nm for the MDAnalysis unit cell *dimensions*.
+
+    *dimensions* is ``[A, B, C, alpha, beta, gamma]`` (lengths in Angstrom,
+    angles in degrees). The box vectors a, b, c are the rows of the result,
+    in the lower triangular form that GROMACS uses. Without a unit cell
+    (``None`` or a zero length) all vectors are zero, i.e. no periodic
+    boundaries.
+    """
+    box = numpy.zeros((3, 3), dtype=numpy.float32)
+    if dimensions is None or numpy.any(numpy.asarray(dimensions[:3]) <= 0):
+        return box
+    a, b, c = 0.1 * numpy.asarray(dimensions[:3], dtype=numpy.float64)
+    alpha, beta, gamma = numpy.radians(dimensions[3:6])
+    box[0, 0] = a
+    box[1, 0] = b * numpy.cos(gamma)
+    box[1, 1] = b * numpy.sin(gamma)
+    box[2, 0] = c * numpy.cos(beta)
+    box[2, 1] = c * (numpy.cos(alpha) - numpy.cos(beta) * numpy.cos(gamma)) / numpy.sin(gamma)
+    box[2, 2] = numpy.sqrt(c*c - box[2, 0]**2 - box[2, 1]**2)
+    return box
+
+def compute_numpy(positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff, out=None):
+    """COM distances and contacts, NumPy implementation.
+
+    :Arguments:
+       *positions*
+          coordinates, shape ``(nframes, natoms, 3)``
+       *boxes*
+          box vectors of each frame, shape ``(nframes, 3, 3)``, see
+          :func:`box_vectors`
+       *masses*
+          atom masses, shape ``(natoms,)``
+       *prim_idx*, *sec_idx*, *sec_offsets*
+          groups, see :func:`flatten_groups`
+       *cutoff*
+          a contact is counted if the distance is < *cutoff*
+       *out*
+          tuple ``(distances, contacts)`` of float32 and int32 arrays that
+          the results are written to; allocated if ``None`` (see
+          :func:`empty_output`)
+
+    :Returns: ``(distances, contacts)``, both with shape ``(nframes, ngroups)``
+    """
+    if out is None:
+        out = empty_output(positions.shape[0], len(sec_offsets) - 1)
+    distances, contacts = out
+    # all groups (primary first) as one flat index array: a single
+    # reduceat gives the weighted sums of every group in every frame
+    idx, first, group = _all_groups(prim_idx, sec_idx, sec_offsets)
+    m = masses[idx]
+    weights = m / numpy.add.reduceat(m, first)[group]
+    pos = positions[:, idx]
+    ref = pos[:, first]
+    d = _minimum_image(numpy, pos - ref[:, group], boxes)
+    d *= weights[:, numpy.newaxis]
+    coms = ref + numpy.add.reduceat(d, first, axis=1)
+    delta = _shortest_image(numpy, coms[:, 1:] - coms[:, :1], boxes)
+    # einsum avoids the temporary array of squares
+    d2 = numpy.einsum('fgi,fgi->fg', delta, delta)
+    numpy.less(d2, cutoff*cutoff, out=contacts)
+    numpy.sqrt(d2, out=distances)
+    return distances, contacts
+
+
+def _compute_chunked(xp, positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff,
+                     out=None):
+    """COM distances and contacts with the array module *xp*, in chunks of frames.
+
+    The COMs of all groups are obtained as one matrix product of the
+    normalized mass weights with the (whole) group positions of a chunk
+    of :data:`CUDA_CHUNK` frames.
+    """
+    nframes = positions.shape[0]
+    ngroups = len(sec_offsets) - 1
+    if out is None:
+        out = empty_output(nframes, ngroups)
+    distances, contacts = out
+    asnumpy = getattr(xp, 'asnumpy', numpy.asarray)
+
+    idx, first, group = _all_groups(prim_idx, sec_idx, sec_offsets)
+    m = numpy.asarray(masses, dtype=numpy.float32)[idx]
+    weights = numpy.zeros((ngroups + 1, len(idx)), dtype=numpy.float32)
+    weights[group, numpy.arange(len(idx))] = m / numpy.bincount(group, weights=m)[group]
+    weights = xp.asarray(weights)
+    first, group = xp.asarray(first), xp.asarray(group)
+    cutoff2 = cutoff * cutoff
+
+    for start in range(0, nframes, CUDA_CHUNK):
+        stop = min(start + CUDA_CHUNK, nframes)
+        pos = xp.asarray(positions[start:stop, idx])
+        box = xp.asarray(boxes[start:stop])
+        ref = pos[:, first]
+        d = _minimum_image(xp, pos - ref[:, group], box)
+        coms = ref + xp.einsum('ga,fai->fgi', weights, d)
+        delta = _shortest_image(xp, coms[:, 1:] - coms[:, :1], box)
+        d2 = (delta * delta).sum(axis=2)
+        contacts[start:stop] = asnumpy(d2 < cutoff2)
+        distances[start:stop] = asnumpy(xp.sqrt(d2))
+    return out
+
+def compute_cupy(positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff, out=None):
+    """COM distances and contacts on the GPU with :mod:`cupy`.
+
+    The trajectory is copied to the GPU in chunks of :data:`CUDA_CHUNK`
+    frames; the results are copied back into the (host) output arrays.
+    """
+    import cupy
+    return _compute_chunked(cupy, positions, boxes, masses, prim_idx, sec_idx, sec_offsets,
+                            cutoff, out=out)
+
+
+if numba is not None:
+    @numba.njit(fastmath=True, cache=True)
+    def _minimum_image_numba(dx, dy, dz, box):
+        half = numpy.float32(0.5)
+        if box[2, 2] > 0:
+            s = numpy.floor(dz / box[2, 2] + half)
+            dx -= s * box[2, 0]
+            dy -= s * box[2, 1]
+            dz -= s * box[2, 2]
+        if box[1, 1] > 0:
+            s = numpy.floor(dy / box[1, 1] + half)
+            dx -= s * box[1, 0]
+            dy -= s * box[1, 1]
+        if box[0, 0] > 0:
+            s = numpy.floor(dx / box[0, 0] + half)
+            dx -= s * box[0, 0]
+        return dx, dy, dz
+
+    @numba.njit(fastmath=True, cache=True)
+    def _shortest_image_numba(dx, dy, dz, box):
+        dx, dy, dz = _minimum_image_numba(dx, dy, dz, box)
+        if box[1, 0] == 0 and box[2, 0] == 0 and box[2, 1] == 0:
+            return dx, dy, dz
+        # triclinic box: also try the neighbouring images
+        bx, by, bz = dx, dy, dz
+        best = dx*dx + dy*dy + dz*dz
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                for k in range(-1, 2):
+                    ex = dx + i * box[0, 0] + j * box[1, 0] + k * box[2, 0]
+                    ey = dy + j * box[1, 1] + k * box[2, 1]
+                    ez = dz + k * box[2, 2]
+                    e2 = ex*ex + ey*ey + ez*ez
+                    if e2 < best:
+                        best = e2
+                        bx, by, bz = ex, ey, ez
+        return bx, by, bz
+
+    @numba.njit(fastmath=True, cache=True)
+    def _com_numba(positions, box, masses, idx, start, stop, inv_mass, t):
+        # COM of the whole group idx[start:stop]: atoms are taken relative
+        # to the first atom of the group with the minimum image convention
+        a = idx[start]
+        rx = positions[t, a, 0]
+        ry = positions[t, a, 1]
+        rz = positions[t, a, 2]
+        sx = sy = sz = numpy.float32(0.0)
+        for k in range(start + 1, stop):
+            a = idx[k]
+            m = masses[a]
+            dx, dy, dz = _minimum_image_numba(positions[t, a, 0] - rx, positions[t, a, 1] - ry,
+                                              positions[t, a, 2] - rz, box)
+            sx += m * dx
+            sy += m * dy
+            sz += m * dz
+        return rx + sx * inv_mass, ry + sy * inv_mass, rz + sz * inv_mass
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _compute_numba(positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff,
+                       distances, contacts):
+        nframes = positions.shape[0]
+        ngroups = sec_offsets.shape[0] - 1
+        zero = numpy.float32(0.0)
+        cutoff2 = numpy.float32(cutoff * cutoff)
+
+        inv_mass_primary = zero
+        for i in range(prim_idx.shape[0]):
+            inv_mass_primary += masses[prim_idx[i]]
+        inv_mass_primary = numpy.float32(1.0) / inv_mass_primary
+        inv_mass = numpy.zeros(ngroups, dtype=numpy.float32)
+        for g in range(ngroups):
+            for k in range(sec_offsets[g], sec_offsets[g+1]):
+                inv_mass[g] += masses[sec_idx[k]]
+            inv_mass[g] = numpy.float32(1.0) / inv_mass[g]
+
+        com_primary = numpy.empty((nframes, 3), dtype=numpy.float32)
+        for t in numba.prange(nframes):
+            px, py, pz = _com_numba(positions, boxes[t], masses, prim_idx, 0,
+                                    prim_idx.shape[0], inv_mass_primary, t)
+            com_primary[t, 0] = px
+            com_primary[t, 1] = py
+            com_primary[t, 2] = pz
+
+        nftiles = (nframes + FRAME_TILE - 1) // FRAME_TILE
+        for gb in range(0, ngroups, GROUP_TILE):
+            ng = min(GROUP_TILE, ngroups - gb)
+            tile_inv_mass = inv_mass[gb:gb+ng].copy()
+            tile_offsets = sec_offsets[gb:gb+ng+1].copy()
+            for fb in numba.prange(nftiles):
+                for t in range(fb * FRAME_TILE, min((fb + 1) * FRAME_TILE, nframes)):
+                    box = boxes[t]
+                    for g in range(ng):
+                        sx, sy, sz = _com_numba(positions, box, masses, sec_idx, tile_offsets[g],
+                                                tile_offsets[g+1], tile_inv_mass[g], t)
+                        dx, dy, dz = _shortest_image_numba(sx - com_primary[t, 0],
+                                                           sy - com_primary[t, 1],
+                                                           sz - com_primary[t, 2], box)
+                        d2 = dx*dx + dy*dy + dz*dz
+                        contacts[t, gb+g] = 1 if d2 < cutoff2 else 0
+                        distances[t, gb+g] = numpy.sqrt(d2)
+
+    def compute_numba(positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff, out=None):
+        """COM distances and contacts, Numba implementation (parallel over frames).
+
+        Works in float32 throughout; *positions*, *boxes* and *masses* must
+        be float32.
+        """
+        if out is None:
+            out = empty_output(positions.shape[0], len(sec_offsets) - 1)
+        _compute_numba(positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff,
+                       out[0], out[1])
+        return out
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _compute_numba_small(positions, boxes, masses, prim_idx, sec_idx, first, last, inv_mass,
+                             cutoff, distances, contacts):
+        # first, last, inv_mass are tuples: Numba compiles (and caches) one
+        # version for each number of groups, with the group loop fully known
+        zero = numpy.float32(0.0)
+        cutoff2 = numpy.float32(cutoff * cutoff)
+        inv_mass_primary = zero
+        for i in range(prim_idx.shape[0]):
+            inv_mass_primary += masses[prim_idx[i]]
+        inv_mass_primary = numpy.float32(1.0) / inv_mass_primary
+        for t in numba.prange(positions.shape[0]):
+            box = boxes[t]
+            px, py, pz = _com_numba(positions, box, masses, prim_idx, 0, prim_idx.shape[0],
+                                    inv_mass_primary, t)
+            for g in range(len(first)):
+                sx, sy, sz = _com_numba(positions, box, masses, sec_idx, first[g], last[g],
+                                        numpy.float32(inv_mass[g]), t)
+                dx, dy, dz = _shortest_image_numba(sx - px, sy - py, sz - pz, box)
+                d2 = dx*dx + dy*dy + dz*dz
+                contacts[t, g] = 1 if d2 < cutoff2 else 0
+                distances[t, g] = numpy.sqrt(d2)
+
+    def compute_numba_small(positions, boxes, masses, prim_idx, sec_idx, sec_offsets, cutoff,
+                            out=None):
+        """COM distances and contacts, Numba kernel for a few secondary groups.
+
+        The group offsets and inverse masses are passed as tuples so that
+        Numba compiles a version of the kernel for each number of groups
+        (up to :data:`MAX_SPECIALIZED_GROUPS`); like all kernels in this
+        module it is cached on disk.
+        """
+        if out is None:
+            out = empty_output(positions.shape[0], len(sec_offsets) - 1)
+        first = tuple(int(k) for k in sec_offsets[:-1])
+        last = tuple(int(k) for k in sec_offsets[1:])
+        inv_mass = tuple(1.0 / float(masses[sec_idx[i:j]].sum()) for i, j in zip(first, last))
+        _compute_numba_small(positions, boxes, masses, prim_idx, sec_idx, first, last, inv_mass,
+                             cutoff, out[0], out[1])
+        return out
+
+    compute = compute_numba
+else:
+    compute = compute_numpy
+
+
+#: Backend that is used if none is selected.
+DEFAULT_BACKEND = "numba" if numba is not None else "numpy"
+
+
+def get_kernel(backend=None, ngroups=None):
+    """Return the kernel function for *backend*.
+
+    *backend* is one of "numpy", "numba", "serial", "openmp" or "cuda"; ``None``
+    uses :envvar:`GROMACSWRAPPER_DIST_BACKEND` or :data:`DEFAULT_BACKEND`.
+    If the number of secondary groups *ngroups* is given and not larger
+    than :data:`MAX_SPECIALIZED_GROUPS` then the "numba" backend uses a
+    kernel specialized for *ngroups* (see :func:`compute_numba_small`).
+    """
+    if backend is None:
+        backend = os.environ.get(BACKEND_ENVVAR, DEFAULT_BACKEND)
+    try:
+        if backend == "numpy":
+            return compute_numpy
+        elif backend == "numba":
+            if numba is None:
+                raise ImportError("No module named numba")
+            if ngroups is not None and ngroups <= MAX_SPECIALIZED_GROUPS:
+                return compute_numba_small
+            return compute_numba
+        elif backend == "serial":
+            import _dist_kernel_serial
+            return _dist_kernel_serial.compute
+        elif backend == "openmp":
+            import _dist_kernel_openmp
+            return _dist_kernel_openmp.compute
+        elif backend == "cuda":
+            import cupy
+            return compute_cupy
+    except ImportError as err:
+        msg = "Distance kernel backend {0!r} is not available ({1!s}); using {2!r}.".format(
+            backend, err, DEFAULT_BACKEND)
+        logger.warn(msg)
+        warnings.warn(msg)
+        return compute
+    raise ValueError("backend must be one of 'numpy', 'numba', 'serial', 'openmp', 'cuda', "
+                     "not {0!r}".format(backend))
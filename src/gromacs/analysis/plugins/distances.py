@@ -7,7 +7,10 @@
 Distance plugin
 ===============
 
-Time series of a selected set of distances.
+Time series of the distances between the centers of mass of index
+groups. The trajectory is analyzed in-process with MDAnalysis_.
+
+.. _MDAnalysis: https://www.mdanalysis.org
 
 Plugin class
 ------------
@@ -24,12 +27,19 @@ The worker class performs the analysis.
 .. autoclass:: _Distances
    :members:
 
+Results
+-------
+
+.. autoclass:: CachedXVG
+   :members:
+
 
 """
 __docformat__ = "restructuredtext en"
 
 import sys
 import os.path
+import math
 import warnings
 import subprocess
 import tempfile
@@ -37,8 +47,137 @@ import numpy
 
 import gromacs
 from gromacs.utilities import AttributeDict, asiterable
-from gromacs.formats import XVG
+from gromacs.formats import NDX
 from gromacs.analysis.core import Worker, Plugin
+import _distances_kernel
+
+
+def _fast_xvg_load(filename):
+    """Return the data of the xvg file *filename* as a float32 array.
+
+    As for :attr:`gromacs.formats.XVG.array`, each column of the file
+    is one row of the array. The file is read with the C parser of
+    :func:`pandas.read_csv` if :mod:`pandas` is installed and with
+    :func:`numpy.loadtxt` otherwise. Only numeric xvg files with a
+    single data set are supported.
+    """
+    with open(filename) as xvg:
+        nheader = 0
+        for line in xvg:
+            if not line.startswith(('#', '@')):
+                break
+            nheader += 1
+    try:
+        import pandas
+    except ImportError:
+        return numpy.loadtxt(filename, skiprows=nheader, comments='#',
+                             dtype=numpy.float32, ndmin=2).T
+    return pandas.read_csv(filename, sep=r'\s+', header=None, skiprows=nheader,
+                           comment='#', engine='c', dtype=numpy.float32).values.T
+
+def _is_newer(filename, *others):
+    """Return ``True`` if *filename* exists and is not older than any existing *others*."""
+    try:
+        mtime = os.path.getmtime(filename)
+    except OSError:
+        return False
+    return all(mtime >= os.path.getmtime(f) for f in others if os.path.exists(f))
+
+def _cachename(filename):
+    """Name of the ``.npy`` file that caches the data of the xvg file *filename*."""
+    return filename + '.npy'
+
+class CachedXVG(object):
+    """Data of a xvg file, parsed once and cached as a ``.npy`` file.
+
+    The array is only read when :attr:`array` is first accessed. If the
+    cache file (the xvg filename with ``.npy`` appended) is newer than
+    the xvg file (or the xvg file was removed) then it is memory-mapped
+    read-only, so only the parts of the data that are actually used are
+    read from disk; otherwise the xvg file is parsed with
+    :func:`_fast_xvg_load` and the cache is written.
+
+    If *array* is supplied then it is used as the data and neither the
+    xvg file nor the cache file are read.
+
+    :attr:`array` always contains the data in the units of the xvg
+    file; :attr:`time` is the first column multiplied by *tscale*.
+    """
+    #: number of points that ``stride='auto'`` in :meth:`plot` aims for
+    maxpoints = 5000
+
+    def __init__(self, filename, array=None, tscale=1.0):
+        self.filename = filename
+        self.cachename = _cachename(filename)
+        self.tscale = tscale
+        self.__array = array
+        self.__time = None
+
+    def _cache_is_fresh(self):
+        return _is_newer(self.cachename, self.filename)
+
+    @property
+    def array(self):
+        """Data as a :class:`numpy.ndarray`, one row per column of the xvg file."""
+        if self.__array is None:
+            if self._cache_is_fresh():
+                try:
+                    self.__array = numpy.load(self.cachename, mmap_mode='r')
+                except (IOError, ValueError) as err:
+                    warnings.warn("Ignoring unreadable cache {0!r}: {1!s}".format(self.cachename, err))
+            if self.__array is None:
+                self.__array = _fast_xvg_load(self.filename)
+                try:
+                    self._write_cache()
+                except (IOError, OSError) as err:
+                    warnings.warn("Could not cache {0!r}: {1!s}".format(self.filename, err))
+        return self.__array
+
+    def _write_cache(self):
+        """Atomically write :attr:`array` to the cache file."""
+        fd, tmp = tempfile.mkstemp(suffix='.npy', dir=os.path.dirname(self.cachename) or os.curdir)
+        try:
+            with os.fdopen(fd, 'wb') as npy:
+                numpy.save(npy, self.__array)
+            os.rename(tmp, self.cachename)     # atomic on POSIX
+        except:
+            os.unlink(tmp)
+            raise
+
+    @property
+    def time(self):
+        """First column of the data multiplied by *tscale* (computed once)."""
+        if self.__time is None:
+            self.__time = self.array[0] * self.tscale
+        return self.__time
+
+    def plot(self, **kwargs):
+        """Plot columns against :attr:`time` with :func:`pylab.plot`.
+
+        :Keywords:
+           *columns*
+              indices of the columns to use; the first one is ignored
+              because :attr:`time` is always the x axis [``Ellipsis``]
+           *ax*
+              :class:`matplotlib.axes.Axes` to plot into [current axes]
+           *stride*
+              only plot every *stride*-th data point; "auto" chooses the
+              stride so that about :attr:`maxpoints` points are plotted ["auto"]
+           *kwargs*
+              all other keywords are passed to :func:`pylab.plot`
+        """
+        import pylab
+        columns = kwargs.pop('columns', Ellipsis)
+        ax = kwargs.pop('ax', None) or pylab.gca()
+        stride = kwargs.pop('stride', 'auto')
+        a = self.array
+        if stride == 'auto':
+            stride = max(1, a.shape[-1] // self.maxpoints)
+        if columns is Ellipsis:
+            y = a[1:, ::stride]
+        else:
+            y = a[list(columns)[1:], ::stride]
+        return ax.plot(self.time[::stride], numpy.transpose(y), **kwargs)
 
 
 # Worker classes that are registered via Plugins (see below)
@@ -54,7 +193,7 @@ class _Distances(Worker):
     """
 
     #: list of results (not used at the moment, see _register_hook())
-    names = ["distance"]
+    names = ["distance", "contacts"]
 
     #: dict of labels for the plot x-axis; one for each result
     xlabels = {"distance": r"time $t/$ns",
@@ -65,7 +204,15 @@ class _Distances(Worker):
                "contacts": r"contacts $N$",
                }
 
-    default_plot_columns = [0, 1]   # plot time and distance only
+    default_plot_columns = Ellipsis   # plot everything by default
+
+    #: By default the trajectory is subsampled to at most this many frames.
+    maxframes = 10000
+    #: Number of frames that are read into memory and processed at a time.
+    blocksize = 100
+
+    # groups for process_chunk(), set up in the worker process
+    _chunk_groups = None
 
     def __init__(self,**kwargs):
         """Set up  customized distance analysis.
@@ -73,8 +220,8 @@ class _Distances(Worker):
         :Arguments:
            groups : list of index group names
              The first entry is the *primary group*. All other entries
-             are *secondary groups* and the plugin calculates the minimum distance
-             between members of the primary group and the members of each
+             are *secondary groups* and the plugin calculates the distance
+             between the centers of mass of the primary group and of each
              secondary group.
            ndx : index filename or list
              All index files that contain the listed groups.
@@ -111,10 +258,13 @@ class _Distances(Worker):
         super(_Distances, self)._register_hook(**kwargs)
         assert self.simulation is not None
 
-        # output filenames for g_dist
-        self.parameters.filenames = {
-            'distance': self.plugindir('distance.xvg'),
-            }
+        # output filenames (the data are cached next to them, see CachedXVG)
+        # (a plain dict so that lookups in analyze() stay cheap)
+        pdir = self.plugindir
+        fnames = {'contacts': pdir('contacts.xvg'),
+                  'distance': pdir('distance.xvg'),
+                  }
+        self.parameters.filenames = fnames
 
         # default filename for the combined plot
         self.parameters.figname = self.figdir('distances')
@@ -123,35 +273,184 @@ class _Distances(Worker):
     # override 'API' methods of base class
 
     def run(self,**kwargs):
-        """Run ``g_dist `` to compute distances between A and B groups.
-
-        Additional arguments can be provided (e.g. ``-b`` or ``-e``)
-        but an error will result if one tries to set parameters that
-        are already being set by the method itself such as ``-s`` or
-        ``-d``; one must to provide the appropriate values to the
-        class constructor.
-
-        If the primary output file already exists then no data are generated
-        and the method returns immediately unless one sets *force* = ``True``.
+        """Compute the distances between the centers of mass of the groups.
+
+        The trajectory is read once with :mod:`MDAnalysis`. For each
+        frame the center of mass (COM) of the primary group and of every
+        secondary group is calculated and the distances between the
+        primary COM and the secondary COMs are written to ``distance.xvg``
+        (time in ps and one column per secondary group, distances in
+        nm). ``contacts.xvg`` contains 1 for each secondary group whose
+        COM is closer than *cutoff* to the primary COM and 0 otherwise.
+        As with :program:`g_dist` the groups are made whole and the
+        distances are those of the closest periodic images.
+
+        :Keywords:
+           *b*
+              first time (in ps) to analyze [``None``]
+           *e*
+              last time (in ps) to analyze [``None``]
+           *stride*
+              only analyze every *stride*-th frame between *b* and *e*;
+              "auto" chooses the stride so that at most :attr:`maxframes`
+              frames are used; 1 uses all frames ["auto"]
+           *backend*
+              kernel that computes the distances: "numpy", "numba",
+              "serial", "openmp" or "cuda"; the default is taken from the
+              environment variable :envvar:`GROMACSWRAPPER_DIST_BACKEND`
+              (see :func:`_distances_kernel.get_kernel`) [``None``]
+           *force*
+              If the primary output file or the cache files of all results
+              (see :class:`CachedXVG`) that are newer than the trajectory
+              already exist then no data are generated and the method
+              returns immediately unless one sets *force* = ``True``.
         """
         force = kwargs.pop('force',False)
         if not force and \
            self.check_file_exists(self.parameters.filenames['distance'], resolve='warn'):
             return
-        indexgroups = self.parameters.indexgroups
-        ngroups = len(indexgroups) - 1    # number of secondary groups
-        if ngroups != 1:
-            raise ValueError("g_dist can only compute the distance between a primary and a secondary group")
-        gromacs.g_dist(s=self.simulation.tpr, n=self.parameters.ndx, f=self.simulation.xtc,
-                       o=self.parameters.filenames['distance'],
-                       input=indexgroups,
-                       **kwargs)
+        if not force and all(_is_newer(_cachename(self.parameters.filenames[name]),
+                                       self.simulation.xtc) for name in self.names):
+            return
+        begin = kwargs.pop('b', None)
+        end = kwargs.pop('e', None)
+        stride = kwargs.pop('stride', 'auto')
+        backend = kwargs.pop('backend', None)
+        if kwargs:
+            raise TypeError("unknown keyword arguments {0!r}".format(kwargs.keys()))
+
+        import MDAnalysis
+        u = MDAnalysis.Universe(self.simulation.tpr, self.simulation.xtc)
+        selection, masses, (prim_idx, sec_idx, sec_offsets) = self._kernel_groups(u.atoms.masses)
+
+        start, stop = self._frame_window(u.trajectory, begin, end)
+        nframes = stop - start
+        if stride == 'auto':
+            stride = max(1, -(-nframes // self.maxframes))
+        nframes = -(-nframes // stride)
+
+        compute = _distances_kernel.get_kernel(backend, ngroups=len(sec_offsets) - 1)
+        times = numpy.empty(nframes)
+        distances, contacts = _distances_kernel.empty_output(nframes, len(sec_offsets) - 1)
+        # the trajectory is processed in blocks of frames so that memory
+        # use does not grow with the length of the trajectory
+        block = min(self.blocksize, nframes)
+        positions, boxes, masses = _distances_kernel.as_kernel_input(
+            numpy.empty((block, len(selection), 3), dtype=numpy.float32),
+            numpy.empty((block, 3, 3), dtype=numpy.float32), masses)
+
+        def process(stop, k):
+            positions[:k] *= 0.1      # Angstrom -> nm
+            compute(positions[:k], boxes[:k], masses, prim_idx, sec_idx, sec_offsets,
+                    self.parameters.cutoff,
+                    out=(distances[stop-k:stop], contacts[stop-k:stop]))
+
+        n = k = 0
+        for ts in u.trajectory[start:stop:stride]:
+            if begin is not None and ts.time < begin:
+                continue
+            if end is not None and ts.time > end:
+                break
+            times[n] = ts.time
+            positions[k] = ts.positions[selection]
+            boxes[k] = _distances_kernel.box_vectors(ts.dimensions)
+            n += 1
+            k += 1
+            if k == block:
+                process(n, k)
+                k = 0
+        if k:
+            process(n, k)
+        self._store(times[:n], distances[:n], contacts[:n])
+
+    def process_chunk(self, start, stop, times, coords, dimensions):
+        """Compute distances and contacts for a chunk of frames.
+
+        Used by :meth:`~gromacs.analysis.core.Simulation.run_pipeline`;
+        returns ``(times, distances, contacts)`` for the chunk.
+        """
+        if self._chunk_groups is None:
+            # once per worker process
+            import MDAnalysis
+            u = MDAnalysis.Universe(self.simulation.tpr)
+            self._chunk_groups = self._kernel_groups(u.atoms.masses)
+        selection, masses, groups = self._chunk_groups
+        boxes = numpy.array([_distances_kernel.box_vectors(d) for d in dimensions])
+        positions, boxes, masses = _distances_kernel.as_kernel_input(
+            coords[:, selection] * 0.1, boxes, masses)      # Angstrom -> nm
+        compute = _distances_kernel.get_kernel(ngroups=len(groups[2]) - 1)
+        distances, contacts = compute(positions, boxes, masses, *groups,
+                                      cutoff=self.parameters.cutoff)
+        return times, distances, contacts
+
+    def merge_chunks(self, chunks):
+        """Write the results of :meth:`process_chunk` to the xvg files."""
+        if chunks:
+            self._store(*[numpy.concatenate(x) for x in zip(*chunks)])
+
+    def _store(self, times, distances, contacts):
+        """Write *distances* and *contacts* (one row per frame) to the xvg files."""
+        names = ['time'] + list(self.parameters.indexgroups[1:])
+        self.store_xvg('distance', numpy.vstack([times, distances.T]), names=names)
+        self.store_xvg('contacts', numpy.vstack([times, contacts.T]), names=names)
+
+    def _kernel_groups(self, masses):
+        """Return ``(selection, masses, groups)`` for the kernels.
+
+        Only the atoms in *selection* (the atoms of all index groups) are
+        passed to the kernels; *masses* are the masses of these atoms and
+        *groups* is the output of :func:`_distances_kernel.flatten_groups`
+        with atom indices that refer to the selection.
+        """
+        groups = self._index_groups()
+        selection = numpy.unique(numpy.concatenate(groups))
+        groups = [numpy.searchsorted(selection, idx) for idx in groups]
+        return selection, masses[selection], _distances_kernel.flatten_groups(groups)
+
+    def _frame_window(self, trajectory, begin=None, end=None):
+        """Return ``(start, stop)`` of the frames of *trajectory* between the times *begin* and *end*.
+
+        The frame numbers are calculated from the time of the first frame
+        and the time step of the trajectory (a MDAnalysis trajectory
+        reader).
+        """
+        nframes = len(trajectory)
+        if nframes == 0 or (begin is None and end is None):
+            return 0, nframes
+        t0, dt = trajectory[0].time, trajectory.dt
+        start, stop = 0, nframes
+        if begin is not None:
+            start = min(nframes, max(0, int(math.ceil((begin - t0) / dt - 1e-6))))
+        if end is not None:
+            stop = min(nframes, max(0, int(math.floor((end - t0) / dt + 1e-6)) + 1))
+        return start, max(start, stop)
+
+    def _index_groups(self):
+        """Return the atom indices (0-based) of all index groups.
+
+        The groups are read from the index files in *ndx*; the first group
+        is the primary group.
+        """
+        ndx = NDX()
+        for f in asiterable(self.parameters.ndx):
+            ndx.read(f)
+        try:
+            return [numpy.asarray(ndx[name]) - 1 for name in self.parameters.indexgroups]
+        except KeyError as err:
+            raise ValueError("index group {0!s} not found in {1!r}".format(err, self.parameters.ndx))
 
     def analyze(self,**kwargs):
-        """Make data files available as numpy arrays."""
+        """Make data files available as numpy arrays.
+
+        The results are :class:`CachedXVG` objects whose
+        :attr:`~CachedXVG.time` is in ns. Each xvg file is parsed only
+        once; afterwards its data are memory-mapped from the ``.npy``
+        cache file next to it.
+        """
+        filenames = self.parameters.filenames
         results = AttributeDict()
-        for name, f in self.parameters.filenames.items():
-            results[name] = XVG(f)
+        for name in self.names:
+            results[name] = CachedXVG(filenames[name], tscale=0.001)  # ps -> ns
         self.results = results
         return results
 
@@ -164,6 +463,9 @@ class _Distances(Worker):
               in separate graphs.
            columns : list
               Which columns to plot; typically the default is ok.
+           stride : int or "auto"
+              Plot only every *stride*-th frame; "auto" decimates long
+              time series to about 5000 points ["auto"]
            figure
                - ``True``: save figures in the given formats
                - "name.ext": save figure under this filename (``ext`` -> format)
@@ -180,36 +482,29 @@ class _Distances(Worker):
                     callback(name=name, axis=ax)
            kwargs
               All other keyword arguments are directly passed to
-              meth:`gromacs.formats.XVG.plot`.
+              meth:`CachedXVG.plot`.
         """
         import pylab
 
         figure = kwargs.pop('figure', False)
         extensions = kwargs.pop('formats', ('pdf','png'))
         callbacks = kwargs.pop('callbacks', None)
-        def ps2ns(a):
-            """Transform first column (in ps) to ns."""
-            _a = numpy.array(a, copy=True)
-            _a[0] *= 0.001
-            return _a
-        kwargs.setdefault('transform', ps2ns)
         kwargs.setdefault('columns', self.default_plot_columns)
+        kwargs.setdefault('stride', 'auto')
 
         if names is None:
             names = self.results.keys()
         names = asiterable(names)  # this is now a list (hopefully of strings)
-        ngraphs = len(names)
-        for plotNum, name in enumerate(names):
-            plotNum += 1
-            ax = pylab.subplot(1, ngraphs, plotNum)
-            try:
-                data = self.results[name].plot(**kwargs)   # results are XVG objects with plot method
-            except KeyError:
-                ax.close()
+        for name in names:
+            if name not in self.results:
                 raise KeyError('name = {0!r} not known, choose one of {1!r}'.format(name, self.results.keys()))
-            #pylab.title(r'Distances: %s' % name)
-            pylab.xlabel(self.xlabels[name])
-            pylab.ylabel(self.ylabels[name])
+        ngraphs = len(names)
+        fig, axes = pylab.subplots(1, ngraphs, squeeze=False)
+        for ax, name in zip(axes[0], names):
+            data = self.results[name].plot(ax=ax, **kwargs)   # results are CachedXVG objects
+            #ax.set_title(r'Distances: %s' % name)
+            ax.set_xlabel(self.xlabels[name])
+            ax.set_ylabel(self.ylabels[name])
 
             # hack: callbacks for customization
             if callbacks is not None:
@@ -234,8 +529,10 @@ class _Distances(Worker):
 class Distances(Plugin):
     """*Distances* plugin.
 
-    The distance between the center of mass of two index groups are
-    calculated for each time step and written to files.
+    The distances between the center of mass of a primary index group
+    and the centers of mass of one or more secondary index groups and the
+    number of contacts are calculated for each time step and written to
+    files. Requires :mod:`MDAnalysis`.
 
     .. class:: Distances(groups, ndx, [cutoff, [, name[, simulation]]])
 
@@ -245,8 +542,8 @@ class Distances(Plugin):
         simulation : instance
             The :class:`gromacs.analysis.Simulation` instance that owns the plugin.
         groups : list of index group names
-            The first entry is the *primary group*, the second is the
-            *secondary group.
+            The first entry is the *primary group*. All other entries
+            are *secondary groups*.
         ndx : index filename or list
             All index files that contain the listed groups.
         cutoff : float
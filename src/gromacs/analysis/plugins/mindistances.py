@@ -28,11 +28,16 @@ The worker class performs the analysis.
 """
 __docformat__ = "restructuredtext en"
 
+import warnings
+
 import gromacs
 from gromacs.utilities import asiterable
-from gromacs.analysis.core import Plugin
+from gromacs.analysis.core import Plugin, Worker
 from distances import _Distances
 
+import logging
+logger = logging.getLogger('gromacs.analysis.plugins.mindistances')
+
 # Worker classes that are registered via Plugins (see below)
 # ----------------------------------------------------------
 # These must be defined before the plugins.
@@ -45,6 +50,11 @@ class _MinDistances(_Distances):
 
     default_plot_columns = Ellipsis   # plot everything by default
 
+    # the distances are computed by g_mindist in run(): do not inherit the
+    # COM distances of _Distances.process_chunk (see Simulation.run_pipeline)
+    process_chunk = Worker.process_chunk.__func__
+    merge_chunks = Worker.merge_chunks.__func__
+
     def _register_hook(self, **kwargs):
         """Run when registering; requires simulation.
 
@@ -56,9 +66,11 @@ class _MinDistances(_Distances):
         assert self.simulation is not None
 
         # output filenames for g_mindist
-        self.parameters.filenames = {'contacts': self.plugindir('contacts.xvg'),
-                                     'distance': self.plugindir('distance.xvg'),
-                                     }
+        pdir = self.plugindir
+        fnames = {'contacts': pdir('contacts.xvg'),
+                  'distance': pdir('distance.xvg'),
+                  }
+        self.parameters.filenames = fnames
         # default filename for the combined plot
         self.parameters.figname = self.figdir('mindist')
 
@@ -73,11 +85,18 @@ class _MinDistances(_Distances):
 
         If the primary output file already exists then no data are generated
         and the method returns immediately unless one sets *force* = ``True``.
+
+        Unless ``-dt`` is given, only frames every *dt* ps are analyzed
+        so that at most :attr:`maxframes` frames between ``-b`` and ``-e``
+        are used (requires :mod:`MDAnalysis` to determine the length of
+        the trajectory). ``dt=None`` analyzes all frames.
         """
         force = kwargs.pop('force',False)
         if not force and \
            self.check_file_exists(self.parameters.filenames['distance'],resolve='warn'):
             return
+        if 'dt' not in kwargs:
+            kwargs['dt'] = self._default_dt(kwargs.get('b'), kwargs.get('e'))
         indexgroups = self.parameters.indexgroups
         ngroups = len(indexgroups) - 1    # number of secondary groups
         kwargs.setdefault('o', None)     # set to True if default output is required, or
@@ -89,6 +108,36 @@ class _MinDistances(_Distances):
                           ng=ngroups, input=indexgroups,
                           **kwargs)
 
+    def _default_dt(self, begin=None, end=None):
+        """Time step in ps that gives at most :attr:`maxframes` frames between *begin* and *end*.
+
+        Returns ``None`` (all frames) if there are not more frames than
+        that or if the trajectory cannot be read. Only the trajectory is
+        read (not the tpr file), but counting its frames may require a
+        pass through the whole file.
+        """
+        try:
+            from MDAnalysis.coordinates.core import reader
+        except ImportError:
+            return None
+        try:
+            trajectory = reader(self.simulation.xtc)
+            try:
+                start, stop = self._frame_window(trajectory, begin, end)
+                dt = trajectory.dt
+            finally:
+                trajectory.close()
+        except Exception as err:
+            msg = "Could not read the trajectory {0!r} ({1!s}); analyzing all frames.".format(
+                self.simulation.xtc, err)
+            logger.warn(msg)
+            warnings.warn(msg)
+            return None
+        nframes = stop - start
+        if nframes <= self.maxframes:
+            return None
+        return dt * -(-nframes // self.maxframes)
+
 
 
 